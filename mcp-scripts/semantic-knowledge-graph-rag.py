@@ -1,7 +1,16 @@
 from mcp.server.fastmcp import FastMCP
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, Result, RoutingControl
 from sentence_transformers import SentenceTransformer, CrossEncoder
-import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Literal
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import numpy as np
+import torch
 
 # ------------------------
 # CREATE INDEXS
@@ -13,17 +22,133 @@ import uuid
 #  `vector.dimensions`: 768,
 #  `vector.similarity_function`: 'cosine'
 # }}
+# Stored and query embeddings are L2-normalized, so cosine reduces to a dot product.
+
+# Range indexes so id lookups (MERGE/MATCH by id, UNWIND id lists) are index seeks
+# CREATE INDEX project_id_idx IF NOT EXISTS FOR (p:Project) ON (p.id)
+# CREATE INDEX summary_id_idx IF NOT EXISTS FOR (s:Summary) ON (s.id)
+
+# ------------------------
+# FAST EMBEDDING MODEL (model2vec, optional)
+# ------------------------
+# Optional fast embedding path for upserts: a model2vec static distillation of
+# all-mpnet-base-v2 (no PCA, so it stays 768-d like project_embedding_index).
+# Created once, offline, with: python semantic-knowledge-graph-rag.py --distill-fast-model
+FAST_EMBEDDING_MODEL_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "all-mpnet-base-v2-m2v"
+)
+
+
+def distill_fast_model():
+    """
+    One-off offline step: distills all-mpnet-base-v2 into the model2vec static
+    model used by fast_embedding upserts and saves it to FAST_EMBEDDING_MODEL_PATH.
+    """
+    if os.path.isdir(FAST_EMBEDDING_MODEL_PATH):
+        print(f"Fast embedding model already exists at {FAST_EMBEDDING_MODEL_PATH}")
+        return
+
+    from model2vec.distill import distill
+
+    fast_model = distill(model_name="sentence-transformers/all-mpnet-base-v2", pca_dims=None)
+    # Save into a temp dir beside the target and rename it into place, so an
+    # interrupted save never leaves a partial model at FAST_EMBEDDING_MODEL_PATH
+    tmp_path = tempfile.mkdtemp(
+        prefix=".m2v-", dir=os.path.dirname(FAST_EMBEDDING_MODEL_PATH)
+    )
+    fast_model.save_pretrained(tmp_path)
+    os.rename(tmp_path, FAST_EMBEDDING_MODEL_PATH)
+    print(f"Fast embedding model saved to {FAST_EMBEDDING_MODEL_PATH}")
+
+
+@lru_cache(maxsize=1)
+def _get_fast_model():
+    """
+    Loads the model2vec static model for fast_embedding upserts. It is never
+    distilled here; run distill_fast_model once beforehand.
+    """
+    if not os.path.isdir(FAST_EMBEDDING_MODEL_PATH):
+        raise RuntimeError(
+            f"fast_embedding needs the distilled model at {FAST_EMBEDDING_MODEL_PATH}. "
+            "Create it once with: python semantic-knowledge-graph-rag.py --distill-fast-model"
+        )
+
+    from model2vec import StaticModel
+
+    return StaticModel.from_pretrained(FAST_EMBEDDING_MODEL_PATH)
+
+
+# The offline distillation step exits here, before any transformer model or
+# the Neo4j driver below is loaded.
+if __name__ == "__main__" and "--distill-fast-model" in sys.argv[1:]:
+    distill_fast_model()
+    sys.exit(0)
 
 # ------------------------
 # CONFIG
 # ------------------------
-# Embedding model
-model = SentenceTransformer("all-mpnet-base-v2")
-cross_encoder_model = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Inference backend for the embedding + reranking models: "openvino", "onnx" or "torch".
+# openvino and onnx load the INT8-quantized weights published with each model.
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "openvino")
+QUANTIZED_MODEL_FILES = {
+    "openvino": "openvino/openvino_model_qint8_quantized.xml",
+    "onnx": "onnx/model_qint8_avx512_vnni.onnx",
+}
+model_kwargs = (
+    {"file_name": QUANTIZED_MODEL_FILES[MODEL_BACKEND]}
+    if MODEL_BACKEND in QUANTIZED_MODEL_FILES else None
+)
+if MODEL_BACKEND == "onnx":
+    import onnxruntime as ort
+
+    session_options = ort.SessionOptions()
+    session_options.intra_op_num_threads = os.cpu_count()
+    session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    model_kwargs.update(provider="CPUExecutionProvider", session_options=session_options)
+
+model = SentenceTransformer(
+    "all-mpnet-base-v2",
+    backend=MODEL_BACKEND,
+    model_kwargs=model_kwargs,
+)
+cross_encoder_model = CrossEncoder(
+    "cross-encoder/ms-marco-MiniLM-L-6-v2",
+    backend=MODEL_BACKEND,
+    model_kwargs=model_kwargs,
+)
+
+# Cross-encoder batching: pairs are sorted by token length so each batch pads
+# only to its own longest pair, and summaries are clipped (~4 chars per token)
+# to the model's 512-token window so oversized documents are not tokenized
+# only to be truncated.
+CROSS_ENCODER_BATCH_SIZE = 64
+CROSS_ENCODER_MAX_CHARS = 512 * 4
+
+torch.set_num_threads(os.cpu_count())
+
+# Search profiles: (k, ef). k caps the candidates taken from each channel
+# (vector and BM25) and the cross-encoder rerank pool; ef is the HNSW beam
+# width. db.index.vector.queryNodes uses its k argument as the beam width, so
+# ef neighbours are requested and trimmed back to k.
+SearchProfile = Literal["fast", "balanced", "recall"]
+SEARCH_PROFILES = {
+    "fast": (20, 40),
+    "balanced": (50, 100),
+    "recall": (100, 400),
+}
 
 # Neo4j connection
 uri = "neo4j://localhost:7687"
-driver = GraphDatabase.driver(uri, auth=("neo4j", "password"))
+database = "neo4j"
+driver = GraphDatabase.driver(
+    uri,
+    auth=("neo4j", "password"),
+    max_connection_pool_size=50,
+    connection_acquisition_timeout=5,
+)
+
+# Worker pool for overlapping independent steps within a request
+executor = ThreadPoolExecutor(max_workers=4)
 
 # MCP server
 mcp = FastMCP(
@@ -34,19 +159,60 @@ mcp = FastMCP(
 # UPSERT PROJECT (With History Chaining)
 # ------------------------
 @mcp.tool(
-    description="Creates or updates a project with a readable name. Links the new summary to the previous one."
+    description="Creates or updates a project with a readable name. Links the new summary to the previous one. Set fast_embedding=True to trade some search quality for a much faster save. Returns 'Saved. ...' for a new summary, or 'Unchanged. ...' (same format, existing summary ID) when the latest summary already has this name, question, summary and embedder."
 )
-def upsert_project_tool(name: str, question: str, summary: str, project_id: str = None) -> str:
-    if not project_id:
-        project_id = str(uuid.uuid4())
-
+def upsert_project_tool(
+    name: str,
+    question: str,
+    summary: str,
+    project_id: str = None,
+    fast_embedding: bool = False
+) -> str:
     text_for_embedding = f"{question}\n{summary}"
-    embedding = model.encode(text_for_embedding).tolist()
-    summary_id = str(uuid.uuid4())
+    # JSON keeps the question/summary boundary unambiguous in the hash input
+    content_hash = hashlib.blake2b(
+        json.dumps([question, summary]).encode(), digest_size=16
+    ).hexdigest()
+    embedding_model = "all-mpnet-base-v2-m2v" if fast_embedding else "all-mpnet-base-v2"
+
+    # Idempotent retry: same name, content and embedder as the latest summary, skip encode + write
+    if project_id:
+        unchanged_cypher = """
+        MATCH (p:Project {id: $project_id})-[:HAS_LATEST_SUMMARY]->(s:Summary)
+        WHERE p.name = $name
+          AND p.question = $question
+          AND s.content_hash = $content_hash
+          AND s.embedding_model = $embedding_model
+        RETURN p.id AS project_id, p.name AS project_name, s.id AS summary_id
+        """
+        records = driver.execute_query(
+            unchanged_cypher,
+            project_id=project_id,
+            name=name,
+            question=question,
+            content_hash=content_hash,
+            embedding_model=embedding_model,
+            database_=database,
+            routing_=RoutingControl.READ,
+        ).records
+        if records:
+            record = records[0]
+            return f"Unchanged. Project: {record['project_name']} ({record['project_id']}), Summary: {record['summary_id']}"
+
+    if fast_embedding:
+        # Static token-embedding lookup + mean, no transformer forward pass
+        embedding = _get_fast_model().encode([text_for_embedding])[0]
+        embedding = embedding / (np.linalg.norm(embedding) or 1.0)
+    else:
+        embedding = model.encode(
+            text_for_embedding, normalize_embeddings=True, convert_to_numpy=True
+        )
+    embedding = embedding.astype(np.float32).tolist()
 
     # Cypher Logic updated to include 'name'
     cypher = """
-    MERGE (p:Project {id: $project_id})
+    // New projects and summaries get their ids server-side
+    MERGE (p:Project {id: coalesce($project_id, randomUUID())})
     SET p.name = $name, 
         p.question = $question, 
         p.updated_at = datetime()
@@ -55,11 +221,16 @@ def upsert_project_tool(name: str, question: str, summary: str, project_id: str
     OPTIONAL MATCH (p)-[old_rel:HAS_LATEST_SUMMARY]->(old_s:Summary)
     DELETE old_rel
 
-    CREATE (s:Summary {id: $summary_id})
+    CREATE (s:Summary {id: randomUUID()})
     SET s.text = $summary,
-        s.embedding = $embedding,
+        s.content_hash = $content_hash,
+        s.embedding_model = $embedding_model,
         s.created_at = datetime()
 
+    // Stored as a compact float32 vector instead of a list of 64-bit floats
+    WITH p, s, old_s
+    CALL db.create.setNodeVectorProperty(s, 'embedding', $embedding)
+
     MERGE (p)-[:HAS_LATEST_SUMMARY]->(s)
     MERGE (p)-[:HAS_SUMMARY]->(s)
 
@@ -71,18 +242,19 @@ def upsert_project_tool(name: str, question: str, summary: str, project_id: str
     RETURN p.id AS project_id, p.name AS project_name, s.id AS summary_id
     """
 
-    with driver.session() as session:
-        result = session.run(
-            cypher,
-            project_id=project_id,
-            name=name,
-            question=question,
-            summary=summary,
-            embedding=embedding,
-            summary_id=summary_id,
-        )
-        record = result.single()
-        return f"Saved. Project: {record['project_name']} ({record['project_id']}), Summary: {record['summary_id']}"
+    record = driver.execute_query(
+        cypher,
+        project_id=project_id or None,
+        name=name,
+        question=question,
+        summary=summary,
+        content_hash=content_hash,
+        embedding_model=embedding_model,
+        embedding=embedding,
+        database_=database,
+        routing_=RoutingControl.WRITE,
+    ).records[0]
+    return f"Saved. Project: {record['project_name']} ({record['project_id']}), Summary: {record['summary_id']}"
 
 # ------------------------
 # GET PROJECT NODE
@@ -101,9 +273,10 @@ def get_project_node(summary_id: str):
     MATCH (p:Project)-[:HAS_SUMMARY]->(s:Summary {id: $summary_id})
     RETURN p.id AS project_id, p.name AS project_name, p.question AS question, p.updated_at AS updated_at
     """
-    with driver.session() as session:
-        record = session.run(cypher, summary_id=summary_id).single()
-        return record.data() if record else None
+    records = driver.execute_query(
+        cypher, summary_id=summary_id, database_=database, routing_=RoutingControl.READ
+    ).records
+    return records[0].data() if records else None
     
 # ------------------------
 # GET LATEST STATE
@@ -116,33 +289,70 @@ def get_latest_summary_tool(project_id: str):
     MATCH (p:Project {id: $project_id})-[:HAS_LATEST_SUMMARY]->(s:Summary)
     RETURN p.id AS project_id, p.question AS project_name, s.text AS latest_summary, s.id AS summary_id
     """
-    with driver.session() as session:
-        result = session.run(cypher, project_id=project_id)
-        record = result.single()
-        return record.data() if record else "No project found."
+    records = driver.execute_query(
+        cypher, project_id=project_id, database_=database, routing_=RoutingControl.READ
+    ).records
+    return records[0].data() if records else "No project found."
+
+# ------------------------
+# RESULT STREAMING
+# ------------------------
+# Passed as result_transformer_ for the candidate searches, so (node_id, score)
+# tuples are built while the result streams in instead of a dict per Record.
+def _id_score_pairs(result) -> list:
+    return [(record["node_id"], record["score"]) for record in result]
 
 # ------------------------
 # SEMANTIC SEARCH
 # ------------------------
-def get_semantic_matches(query_text: str, top_k: int = 9, min_score: float = 0.35):
+@lru_cache(maxsize=512)
+def _encode_cached(text: str) -> tuple:
     """
-    Performs a semantic search on the embeddings and returns matching nodes with scores.
+    Encodes a query once and caches the embedding, so repeated queries skip the forward pass.
     """
-    query_embedding = model.encode(query_text).tolist()
+    return tuple(model.encode(
+        text, normalize_embeddings=True, convert_to_numpy=True
+    ).astype(np.float32).tolist())
+
+
+def get_semantic_matches(
+    query_text: str,
+    top_k: int = 9,
+    min_score: float = 0.35,
+    query_embedding=None,
+    profile: SearchProfile = "balanced"
+):
+    """
+    Standalone helper (hybrid_rrf_search runs its own vector lookup inside the
+    fused query): performs a semantic search on the embeddings and returns
+    (node_id, score) tuples. Summary text is not included; callers that need it
+    pass the ids they keep to get_data_tool.
+    Pass query_embedding to reuse an embedding already computed for query_text.
+    profile caps top_k at the profile's k and picks the search beam width (ef).
+    """
+    if query_embedding is None:
+        query_embedding = _encode_cached(query_text)
+    profile_k, profile_ef = SEARCH_PROFILES[profile]
+    top_k = min(top_k, profile_k)
+    ef = max(top_k, profile_ef)
     cypher = """
-    CALL db.index.vector.queryNodes('project_embedding_index', $top_k, $embedding)
+    CALL db.index.vector.queryNodes('project_embedding_index', $ef, $embedding)
     YIELD node, score
     WHERE score >= $min_score
-    RETURN node.id AS node_id, node.text AS summary, score
+    RETURN node.id AS node_id, score
+    ORDER BY score DESC
+    LIMIT $top_k
     """
-    with driver.session() as session:
-        result = session.run(
-            cypher,
-            top_k=top_k,
-            embedding=query_embedding,
-            min_score=min_score
-        )
-        return [record.data() for record in result]
+    return driver.execute_query(
+        cypher,
+        ef=ef,
+        top_k=top_k,
+        embedding=list(query_embedding),
+        min_score=min_score,
+        database_=database,
+        routing_=RoutingControl.READ,
+        result_transformer_=_id_score_pairs,
+    )
         
 
 @mcp.tool(
@@ -151,18 +361,25 @@ def get_semantic_matches(query_text: str, top_k: int = 9, min_score: float = 0.3
 def get_data_tool(node_ids: list):
     """
     Fetches project information for the given embedding node IDs.
+    Rows come back in the order of node_ids, so ranked id lists stay ranked.
     """
     if not node_ids:
         return []
 
     cypher = """
-    MATCH (p:Project)-[:HAS_SUMMARY]->(n)
-    WHERE n.id IN $node_ids
-    RETURN p.id AS id, p.question AS question, n.text AS summary
+    UNWIND range(0, size($node_ids) - 1) AS i
+    WITH i, $node_ids[i] AS node_id
+    MATCH (p:Project)-[:HAS_SUMMARY]->(n:Summary {id: node_id})
+    RETURN p.id AS id, p.question AS question, n.text AS summary, i AS rank
+    ORDER BY i
     """
-    with driver.session() as session:
-        result = session.run(cypher, node_ids=node_ids)
-        return [record.data() for record in result]
+    return driver.execute_query(
+        cypher,
+        node_ids=node_ids,
+        database_=database,
+        routing_=RoutingControl.READ,
+        result_transformer_=Result.data,
+    )
 
 # ------------------------
 # BM25 FULL-TEXT SEARCH
@@ -170,6 +387,7 @@ def get_data_tool(node_ids: list):
 def get_bm25_matches(query_text: str, top_k: int = 10, min_score: float = 0.0):
     """
     Performs BM25 keyword-based search using Neo4j full-text index.
+    Returns (node_id, score) tuples only; fetch summaries with get_data_tool.
     """
     cypher = """
     CALL db.index.fulltext.queryNodes(
@@ -179,104 +397,146 @@ def get_bm25_matches(query_text: str, top_k: int = 10, min_score: float = 0.0):
     YIELD node, score
     WHERE score >= $min_score
     RETURN node.id AS node_id,
-           node.text AS summary,
            score
     ORDER BY score DESC
     LIMIT $top_k
     """
 
-    with driver.session() as session:
-        result = session.run(
-            cypher,
-            query_text=query_text,
-            top_k=top_k,
-            min_score=min_score
-        )
-        return [record.data() for record in result]
+    return driver.execute_query(
+        cypher,
+        query_text=query_text,
+        top_k=top_k,
+        min_score=min_score,
+        database_=database,
+        routing_=RoutingControl.READ,
+        result_transformer_=_id_score_pairs,
+    )
 
 # ------------------------
 # HYBRID SEARCH (RRF FUSION)
 # ------------------------
-def hybrid_rrf_search(query_text: str, top_k: int = 197, rrf_k: int = 60):
+def hybrid_rrf_search(query_text: str, top_k: int = 20, rrf_k: int = 60, profile: SearchProfile = "balanced"):
     """
     Combines BM25 + semantic search results using Reciprocal Rank Fusion.
+    The BM25 lookup runs on a worker thread while the query is being embedded;
+    the vector search, the fusion and the project join then run in a single
+    Cypher statement, so only the fused top_k rows come back over the network.
+    Each channel contributes at most the profile's k candidates.
     """
-    # ---- Step 1: Get semantic results ----
-    semantic_results = get_semantic_matches(
-        query_text=query_text,
-        top_k=top_k * 2,
-        min_score=0.0
-    )
-    # ---- Step 2: Get BM25 results ----
-    bm25_results = get_bm25_matches(
-        query_text=query_text,
-        top_k=top_k * 2,
-        min_score=0.0
-    )
-    # ---- Step 3: Rank maps ----
-    rrf_scores = {}
-    # Semantic ranking contribution
-    for rank, item in enumerate(semantic_results, start=1):
-        node_id = item["node_id"]
-        rrf_scores.setdefault(node_id, 0)
-        rrf_scores[node_id] += 1 / (rrf_k + rank)
-    # BM25 ranking contribution
-    for rank, item in enumerate(bm25_results, start=1):
-        node_id = item["node_id"]
-        rrf_scores.setdefault(node_id, 0)
-        rrf_scores[node_id] += 1 / (rrf_k + rank)
-    # ---- Step 4: Sort by RRF score ----
-    ranked_ids = sorted(
-        rrf_scores.items(),
-        key=lambda x: x[1],
-        reverse=True
+    candidate_k, ef = SEARCH_PROFILES[profile]
+    bm25_future = executor.submit(get_bm25_matches, query_text, candidate_k, 0.0)
+    query_embedding = _encode_cached(query_text)
+    bm25_ids = [node_id for node_id, _ in bm25_future.result()]
+    cypher = """
+    CALL db.index.vector.queryNodes('project_embedding_index', $ef, $embedding)
+    YIELD node, score
+    WITH node, score
+    ORDER BY score DESC
+    LIMIT $candidate_k
+    WITH collect(node.id) AS semantic_ids
+    UNWIND [i IN range(0, size(semantic_ids) - 1) | {id: semantic_ids[i], rank: i + 1}] +
+           [i IN range(0, size($bm25_ids) - 1) | {id: $bm25_ids[i], rank: i + 1}] AS row
+    WITH row.id AS node_id, sum(1.0 / ($rrf_k + row.rank)) AS rrf_score
+    ORDER BY rrf_score DESC
+    LIMIT $top_k
+    MATCH (p:Project)-[:HAS_SUMMARY]->(n:Summary {id: node_id})
+    RETURN p.id AS id, p.question AS question, n.text AS summary, rrf_score
+    ORDER BY rrf_score DESC
+    """
+    return driver.execute_query(
+        cypher,
+        embedding=list(query_embedding),
+        bm25_ids=bm25_ids,
+        candidate_k=candidate_k,
+        ef=ef,
+        rrf_k=rrf_k,
+        top_k=top_k,
+        database_=database,
+        routing_=RoutingControl.READ,
+        result_transformer_=Result.data,
     )
-    # Keep top_k
-    top_ranked_ids = [node_id for node_id, _ in ranked_ids[:top_k]]
-    # ---- Step 5: Fetch project data ----
-    return get_data_tool(top_ranked_ids)
 
 # ------------------------
 # HYBRID SEARCH (RRF FUSION) + CROSS-ENCODER
 # ------------------------
+def _top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Indices of the top_k highest scores, best first: O(N) partition, then sort only the survivors.
+    """
+    if top_k < len(scores):
+        idx = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        idx = np.arange(len(scores))
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def _cross_encode(query_doc_pairs: list) -> np.ndarray:
+    """
+    Scores (query, doc) pairs with the cross-encoder. Pairs are tokenized once,
+    then run in length-sorted batches; scores come back in the input order.
+    """
+    tokenizer = cross_encoder_model.tokenizer
+    queries, docs = zip(*query_doc_pairs)
+    encoded = tokenizer(
+        list(queries),
+        list(docs),
+        truncation=True,
+        max_length=cross_encoder_model.max_length,
+        return_length=True
+    )
+    order = np.argsort(encoded["length"], kind="stable")
+    scores = np.empty(len(query_doc_pairs), dtype=np.float32)
+
+    with torch.inference_mode():
+        for start in range(0, len(order), CROSS_ENCODER_BATCH_SIZE):
+            batch_idx = order[start:start + CROSS_ENCODER_BATCH_SIZE]
+            batch = tokenizer.pad(
+                {name: [encoded[name][i] for i in batch_idx] for name in tokenizer.model_input_names},
+                return_tensors="pt"
+            ).to(cross_encoder_model.device)
+            logits = cross_encoder_model.model(**batch).logits
+            scores[batch_idx] = cross_encoder_model.activation_fn(logits).view(-1).float().cpu().numpy()
+    return scores
+
+
 @mcp.tool(
     description="Performs hybrid search using BM25 and semantic vector search with Reciprocal Rank Fusion (RRF) for candidate ranking, then reranks the top results using a Cross-Encoder neural model for precise relevance scoring."
 )
 def hybrid_rerank_search(
     query_text: str,
-    top_k: int = 197,
-    rrf_k: int = 60
+    top_k: int = 20,
+    rrf_k: int = 60,
+    profile: SearchProfile = "balanced"
 ):
     """
     1. Get candidates via BM25 + semantic RRF fusion
     2. Re-rank using cross-encoder neural model
+
+    profile: "fast", "balanced" or "recall" — trades search and rerank effort for
+    recall. Its k (20 / 50 / 100) caps both the candidates per channel and the
+    rerank pool, so at most k results come back; the default top_k of 20 is
+    reachable with every profile.
     """
 
     # --- 1️⃣ Candidate retrieval with RRF ---
-    candidates = hybrid_rrf_search(query_text, top_k=top_k*3, rrf_k=rrf_k)
+    rerank_pool = min(top_k * 3, SEARCH_PROFILES[profile][0])
+    candidates = hybrid_rrf_search(query_text, top_k=rerank_pool, rrf_k=rrf_k, profile=profile)
 
     if not candidates:
         return []
 
     # --- 2️⃣ Prepare pairs for cross-encoder ---
-    query_doc_pairs = [(query_text, c["summary"]) for c in candidates]
+    query_doc_pairs = [(query_text, c["summary"][:CROSS_ENCODER_MAX_CHARS]) for c in candidates]
 
     # --- 3️⃣ Predict relevance scores ---
-    scores = cross_encoder_model.predict(query_doc_pairs)
+    scores = _cross_encode(query_doc_pairs)
 
-    # --- 4️⃣ Assign cross-encoder scores ---
-    for c, s in zip(candidates, scores):
-        c["cross_score"] = s
-
-    # --- 5️⃣ Sort by cross-encoder score ---
-    reranked_results = sorted(
-        candidates,
-        key=lambda x: x["cross_score"],
-        reverse=True
-    )
-
-    # Return top_k results
-    return reranked_results[:top_k]
+    # --- 4️⃣ Select top_k by cross-encoder score, scoring only the survivors ---
+    reranked_results = []
+    for i in _top_k_indices(scores, top_k):
+        candidates[i]["cross_score"] = float(scores[i])
+        reranked_results.append(candidates[i])
+    return reranked_results
 
 # ------------------------
 # DELETE PROJECT
@@ -290,13 +550,19 @@ def delete_project_tool(project_id: str) -> bool:
         project_id: The unique ID of the project to remove.
     """
     cypher = "MATCH (p:Project {id: $project_id}) DETACH DELETE p"
-    with driver.session() as session:
-        session.run(cypher, project_id=project_id)
+    driver.execute_query(
+        cypher, project_id=project_id, database_=database, routing_=RoutingControl.WRITE
+    )
     return True
 
 # ------------------------
 # START MCP SERVER
 # ------------------------
 if __name__ == "__main__":
+    # Warm up both models at realistic lengths so the first tool call does not
+    # pay for allocator setup and kernel selection
+    model.encode("warmup " * 64)
+    _cross_encode([("warmup", "warmup " * 100)] * 4)
+
     # Run over stdio (for AI agent integration) or change to SSE/HTTP if you want remote access
     mcp.run()
\ No newline at end of file